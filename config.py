@@ -4,6 +4,10 @@ Environment variables expected (suitable for Railway):
 - BOT_TOKEN: Telegram bot token (required).
 - ADMIN_USER_ID: Telegram user ID for the admin (optional, defaults to Tanya's ID 5386753143).
 - DATABASE_PATH: Path to SQLite database file (optional, defaults to './projects.db').
+- OUTBOUND_MAX_WAIT_MS: How long relayed texts to one chat are collected before
+  being sent as a single message (optional, defaults to 250).
+- OUTBOUND_MAX_BATCH: Maximum number of texts combined into one message
+  (optional, defaults to 10; 1 disables batching).
 
 The bot runs with long polling (no webhooks) as recommended for Railway free tier.
 """
@@ -22,4 +26,13 @@ try:
 except ValueError as exc:
     raise RuntimeError("ADMIN_USER_ID must be an integer") from exc
 
+# Admin identities as a set so membership checks stay O(1) if more admins are added.
+ADMIN_USER_IDS: frozenset[int] = frozenset({ADMIN_USER_ID})
+
 DATABASE_PATH = os.environ.get("DATABASE_PATH", "./projects.db")
+
+try:
+    OUTBOUND_MAX_WAIT_MS = int(os.environ.get("OUTBOUND_MAX_WAIT_MS", 250))
+    OUTBOUND_MAX_BATCH = int(os.environ.get("OUTBOUND_MAX_BATCH", 10))
+except ValueError as exc:
+    raise RuntimeError("OUTBOUND_MAX_WAIT_MS and OUTBOUND_MAX_BATCH must be integers") from exc
@@ -5,6 +5,7 @@ Deployment on Railway (long polling):
    - BOT_TOKEN: Telegram bot token
    - ADMIN_USER_ID: (optional) Telegram user ID of the admin (defaults to 5386753143)
    - DATABASE_PATH: (optional) SQLite path, defaults to './projects.db'
+   - OUTBOUND_MAX_WAIT_MS / OUTBOUND_MAX_BATCH: (optional) text batching knobs, default 250 ms / 10
 2. Install dependencies: `pip install -r requirements.txt`
 3. Run the bot: `python main.py`
 
@@ -14,9 +15,16 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from typing import Optional
+import signal
+import sys
+from typing import Any, Awaitable, Callable, Optional, Sequence, Tuple
 
-from telegram import Message, Update
+try:
+    import uvloop
+except ImportError:  # uvloop is unavailable on Windows; fall back to asyncio's loop.
+    uvloop = None
+
+from telegram import Audio, Bot, Document, Message, PhotoSize, Update, Video, Voice
 from telegram.constants import ParseMode
 from telegram.ext import (
     AIORateLimiter,
@@ -28,8 +36,9 @@ from telegram.ext import (
     filters,
 )
 
-from config import ADMIN_USER_ID, BOT_TOKEN, DATABASE_PATH
-from storage import Project, SQLiteProjectStorage
+from config import ADMIN_USER_IDS, BOT_TOKEN, DATABASE_PATH, OUTBOUND_MAX_BATCH, OUTBOUND_MAX_WAIT_MS
+from outbound import OutboundBatcher
+from storage import SQLiteProjectStorage
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -37,24 +46,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Seconds Telegram holds a getUpdates request open waiting for new updates;
+# PTB extends the HTTP read timeout by the same amount.
+LONG_POLL_TIMEOUT = 50
+
+RELAY_FAILURE_REPLY = "Не удалось переслать сообщение. Проверьте настройки бота."
+
 storage = SQLiteProjectStorage(DATABASE_PATH)
+batcher = OutboundBatcher(RELAY_FAILURE_REPLY, max_wait_ms=OUTBOUND_MAX_WAIT_MS, max_batch=OUTBOUND_MAX_BATCH)
+
+_ADMINS = ADMIN_USER_IDS
 
 
 def is_admin(user_id: Optional[int]) -> bool:
-    return user_id == ADMIN_USER_ID
+    return user_id in _ADMINS
 
 
 def admin_only(func):  # type: ignore[override]
-    async def wrapper(update: Update, context: CallbackContext):
+    # A plain function handing back the handler's coroutine: PTB awaits whatever
+    # the callback returns, so the guard needs no coroutine frame of its own.
+    def guard(update: Update, context: CallbackContext) -> Awaitable[Any]:
         user_id = update.effective_user.id if update.effective_user else None
         if not is_admin(user_id):
-            await update.effective_message.reply_text("Эта команда доступна только администратору.")
-            return
-        return await func(update, context)
+            return update.effective_message.reply_text("Эта команда доступна только администратору.")
+        return func(update, context)
 
-    return wrapper
+    return guard
 
 
+@admin_only
 async def create_project(update: Update, context: CallbackContext) -> None:
     if not context.args:
         await update.message.reply_text("Использование: /create_project <slug>")
@@ -62,7 +82,7 @@ async def create_project(update: Update, context: CallbackContext) -> None:
     slug = context.args[0]
     chat_id = update.effective_chat.id
     try:
-        project = storage.create_project(slug, executor_chat_id=chat_id)
+        project = await storage.create_project(slug, executor_chat_id=chat_id)
     except ValueError as exc:
         await update.message.reply_text(str(exc))
         return
@@ -71,6 +91,7 @@ async def create_project(update: Update, context: CallbackContext) -> None:
     )
 
 
+@admin_only
 async def bind_customer(update: Update, context: CallbackContext) -> None:
     if not context.args:
         await update.message.reply_text("Использование: /bind_customer <slug>")
@@ -78,7 +99,7 @@ async def bind_customer(update: Update, context: CallbackContext) -> None:
     slug = context.args[0]
     chat_id = update.effective_chat.id
     try:
-        project = storage.bind_customer(slug, customer_chat_id=chat_id)
+        project = await storage.bind_customer(slug, customer_chat_id=chat_id)
     except ValueError as exc:
         await update.message.reply_text(str(exc))
         return
@@ -87,7 +108,7 @@ async def bind_customer(update: Update, context: CallbackContext) -> None:
 
 async def project_info(update: Update, context: CallbackContext) -> None:
     chat_id = update.effective_chat.id
-    project = storage.find_by_chat(chat_id)
+    project = await storage.find_by_chat(chat_id)
     if not project:
         await update.message.reply_text("Этот чат не привязан ни к одному проекту.")
         return
@@ -99,22 +120,28 @@ async def project_info(update: Update, context: CallbackContext) -> None:
     await update.message.reply_text(f"Проект: {project.slug}\nТип чата: {chat_type}\nСтатус: {status}")
 
 
+# Status words indexed by a bool: [False] / [True].
+_BINDING_STATUS = ("не привязан", "привязан")
+_ACTIVE_STATUS = ("неактивен", "активен")
+
+
+@admin_only
 async def list_projects(update: Update, context: CallbackContext) -> None:
-    projects = storage.list_projects()
+    projects = await storage.list_projects()
     if not projects:
         await update.message.reply_text("Проекты отсутствуют.")
         return
-    lines = []
-    for project in projects:
-        customer_status = "привязан" if project.customer_chat_id else "не привязан"
-        executor_status = "привязан" if project.executor_chat_id else "не привязан"
-        active_status = "активен" if project.is_active else "неактивен"
-        lines.append(
-            f"{project.slug}: заказчик {customer_status}, исполнитель {executor_status}, статус {active_status}"
+    await update.message.reply_text(
+        "\n".join(
+            f"{project.slug}: заказчик {_BINDING_STATUS[bool(project.customer_chat_id)]}, "
+            f"исполнитель {_BINDING_STATUS[bool(project.executor_chat_id)]}, "
+            f"статус {_ACTIVE_STATUS[project.is_active]}"
+            for project in projects
         )
-    await update.message.reply_text("\n".join(lines))
+    )
 
 
+@admin_only
 async def unlink_project(update: Update, context: CallbackContext) -> None:
     if not context.args:
         await update.message.reply_text("Использование: /unlink_project <slug>")
@@ -122,7 +149,7 @@ async def unlink_project(update: Update, context: CallbackContext) -> None:
     slug = context.args[0]
     chat_id = update.effective_chat.id
     try:
-        project = storage.unlink_chat(slug, chat_id=chat_id)
+        project = await storage.unlink_chat(slug, chat_id=chat_id)
     except ValueError as exc:
         await update.message.reply_text(str(exc))
         return
@@ -131,40 +158,65 @@ async def unlink_project(update: Update, context: CallbackContext) -> None:
     )
 
 
-action_labels = {
-    "customer": "👤 Клиент:",
-    "executor": "🧑‍🎨 Команда:",
-}
+# Relay roles index _PREFIXES directly.
+ROLE_CUSTOMER = 0
+ROLE_EXECUTOR = 1
+
+# Prefixes include the separating space so relaying is a single concatenation.
+_PREFIXES = (
+    sys.intern("👤 Клиент: "),
+    sys.intern("🧑‍🎨 Команда: "),
+)
+
+
+async def _send_photo(bot: Bot, chat_id: int, photo: Sequence[PhotoSize], caption: Optional[str]) -> None:
+    await bot.send_photo(chat_id=chat_id, photo=photo[-1].file_id, caption=caption)
+
+
+async def _send_document(bot: Bot, chat_id: int, document: Document, caption: Optional[str]) -> None:
+    await bot.send_document(chat_id=chat_id, document=document.file_id, caption=caption)
+
+
+async def _send_voice(bot: Bot, chat_id: int, voice: Voice, caption: Optional[str]) -> None:
+    await bot.send_voice(chat_id=chat_id, voice=voice.file_id, caption=caption)
+
+
+async def _send_audio(bot: Bot, chat_id: int, audio: Audio, caption: Optional[str]) -> None:
+    await bot.send_audio(chat_id=chat_id, audio=audio.file_id, caption=caption)
+
+
+async def _send_video(bot: Bot, chat_id: int, video: Video, caption: Optional[str]) -> None:
+    await bot.send_video(chat_id=chat_id, video=video.file_id, caption=caption)
+
 
+MediaSender = Callable[[Bot, int, Any, Optional[str]], Awaitable[None]]
+
+# Checked in order; the first non-empty attribute decides how the message is relayed.
+_MEDIA_SENDERS = (
+    ("photo", _send_photo),
+    ("document", _send_document),
+    ("voice", _send_voice),
+    ("audio", _send_audio),
+    ("video", _send_video),
+)
 
-async def relay_text(project: Project, message: Message, target_chat_id: int, role: str) -> None:
-    prefix = action_labels[role]
-    text = message.text or message.caption or ""
-    await message.get_bot().send_message(chat_id=target_chat_id, text=f"{prefix} {text}")
 
+def _classify(message: Message) -> Optional[Tuple[MediaSender, Any]]:
+    """Return the sender and payload for the message's media, or None for plain messages."""
+    for attr, sender in _MEDIA_SENDERS:
+        media = getattr(message, attr)
+        if media:
+            return sender, media
+    return None
 
-async def relay_media(project: Project, message: Message, target_chat_id: int, role: str) -> None:
+
+async def relay_media(message: Message, target_chat_id: int, role: int, sender: MediaSender, payload: Any) -> None:
     bot = message.get_bot()
     caption = message.caption
-    prefix = action_labels[role]
-    caption_prefixed = f"{prefix} {caption}" if caption else None
-
-    if message.photo:
-        file_id = message.photo[-1].file_id
-        await bot.send_photo(chat_id=target_chat_id, photo=file_id, caption=caption_prefixed)
-    elif message.document:
-        await bot.send_document(chat_id=target_chat_id, document=message.document.file_id, caption=caption_prefixed)
-    elif message.voice:
-        await bot.send_voice(chat_id=target_chat_id, voice=message.voice.file_id, caption=caption_prefixed)
-    elif message.audio:
-        await bot.send_audio(chat_id=target_chat_id, audio=message.audio.file_id, caption=caption_prefixed)
-    elif message.video:
-        await bot.send_video(chat_id=target_chat_id, video=message.video.file_id, caption=caption_prefixed)
-    else:
-        # If media type is not supported, fallback to sending text.
-        text = message.text or caption or "(неизвестный тип сообщения)"
-        await bot.send_message(chat_id=target_chat_id, text=f"{prefix} {text}")
-        return
+    caption_prefixed = _PREFIXES[role] + caption if caption else None
+    # Media always goes out on its own, after any text still waiting for this chat.
+    await batcher.flush(bot, target_chat_id, role)
+    await sender(bot, target_chat_id, payload, caption_prefixed)
 
 
 async def relay_message(update: Update, context: CallbackContext) -> None:
@@ -175,29 +227,35 @@ async def relay_message(update: Update, context: CallbackContext) -> None:
     if message.from_user and message.from_user.is_bot:
         return
 
-    project = storage.find_by_chat(update.effective_chat.id)
+    project = await storage.find_by_chat(update.effective_chat.id)
     if not project or not project.is_active:
         return
 
     source_chat_id = update.effective_chat.id
     if project.executor_chat_id == source_chat_id and project.customer_chat_id:
         target_chat_id = project.customer_chat_id
-        role = "executor"
+        role = ROLE_EXECUTOR
     elif project.customer_chat_id == source_chat_id and project.executor_chat_id:
         target_chat_id = project.executor_chat_id
-        role = "customer"
+        role = ROLE_CUSTOMER
     else:
         return
 
     try:
-        if message.text and not message.photo and not message.document and not message.voice and not message.audio and not message.video:
-            await relay_text(project, message, target_chat_id, role)
+        media = _classify(message)
+        if media is not None:
+            await relay_media(message, target_chat_id, role, *media)
+        elif text := message.text:
+            # Plain text, the bulk of relayed traffic: no media means no caption to check.
+            await batcher.send_text(message.get_bot(), target_chat_id, role, _PREFIXES[role] + text, message)
         else:
-            await relay_media(project, message, target_chat_id, role)
+            # If media type is not supported, fallback to sending its caption as text.
+            text = message.caption or "(неизвестный тип сообщения)"
+            await batcher.send_text(message.get_bot(), target_chat_id, role, _PREFIXES[role] + text, message)
     except Exception as exc:  # noqa: BLE001
         logger.exception("Ошибка при пересылке сообщения: %s", exc)
         try:
-            await message.reply_text("Не удалось переслать сообщение. Проверьте настройки бота.")
+            await message.reply_text(RELAY_FAILURE_REPLY)
         except Exception:  # noqa: BLE001
             logger.exception("Не удалось отправить сообщение об ошибке")
 
@@ -208,24 +266,11 @@ async def start(update: Update, context: CallbackContext) -> None:
     )
 
 
-@admin_only
-async def admin_create_project(update: Update, context: CallbackContext) -> None:
-    await create_project(update, context)
-
-
-@admin_only
-async def admin_bind_customer(update: Update, context: CallbackContext) -> None:
-    await bind_customer(update, context)
-
-
-@admin_only
-async def admin_list_projects(update: Update, context: CallbackContext) -> None:
-    await list_projects(update, context)
-
-
-@admin_only
-async def admin_unlink_project(update: Update, context: CallbackContext) -> None:
-    await unlink_project(update, context)
+# Built once at import. Only the media kinds relay_media knows how to forward are
+# listed, so filters.ATTACHMENT (stickers, polls, locations, ...) is not used.
+RELAY_FILTER = ~filters.COMMAND & (
+    filters.TEXT | filters.Document.ALL | filters.PHOTO | filters.VOICE | filters.AUDIO | filters.VIDEO
+)
 
 
 def build_application() -> Application:
@@ -240,42 +285,65 @@ def build_application() -> Application:
     # Command handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("project_info", project_info))
-    application.add_handler(CommandHandler("create_project", admin_create_project))
-    application.add_handler(CommandHandler("bind_customer", admin_bind_customer))
-    application.add_handler(CommandHandler("list_projects", admin_list_projects))
-    application.add_handler(CommandHandler("unlink_project", admin_unlink_project))
-
-    # Message handler for all content types
-    application.add_handler(
-        MessageHandler(
-            filters.ALL
-            & ~filters.COMMAND
-            & (filters.TEXT
-               | filters.Document.ALL
-               | filters.PHOTO
-               | filters.VOICE
-               | filters.AUDIO
-               | filters.VIDEO),
-            relay_message,
-        )
-    )
+    application.add_handler(CommandHandler("create_project", create_project))
+    application.add_handler(CommandHandler("bind_customer", bind_customer))
+    application.add_handler(CommandHandler("list_projects", list_projects))
+    application.add_handler(CommandHandler("unlink_project", unlink_project))
+
+    # Message handler for all relayed content types
+    application.add_handler(MessageHandler(RELAY_FILTER, relay_message))
 
     return application
 
 
-async def main() -> None:
-    application = build_application()
-    await application.initialize()
-    await application.start()
-    logger.info("Bot started with long polling")
-    await application.updater.start_polling(drop_pending_updates=True)
+async def wait_for_stop_signal() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: Ctrl+C still arrives as KeyboardInterrupt.
+            pass
+    await stop.wait()
+
 
-    # Keep running until interrupted
-    await asyncio.Event().wait()
+async def main() -> None:
+    try:
+        # Inside the try so a failed schema/cache setup still closes the
+        # connection's worker thread and the process exits with the error.
+        await storage.connect()
+        application = build_application()
+        async with application:
+            await application.start()
+            logger.info("Bot started with long polling")
+            await application.updater.start_polling(
+                poll_interval=0,
+                timeout=LONG_POLL_TIMEOUT,
+                drop_pending_updates=True,
+            )
+
+            # Keep running until SIGINT/SIGTERM (Railway stops services with SIGTERM).
+            try:
+                await wait_for_stop_signal()
+            finally:
+                await application.updater.stop()
+                # stop() still processes updates left in the queue, which may
+                # enqueue more text; flush afterwards, before shutdown() closes
+                # the bot's HTTP client.
+                await application.stop()
+                await batcher.flush_all(application.bot)
+    finally:
+        await storage.close()
 
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        if uvloop is not None:
+            # uvloop.run builds its own loop; event loop policies are deprecated in 3.14.
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
     except (KeyboardInterrupt, SystemExit):
-        logger.info("Bot stopped")
+        pass
+    logger.info("Bot stopped")
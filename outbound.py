@@ -0,0 +1,118 @@
+"""Outbound batching for relayed text messages.
+
+Bursts of text relayed to the same chat are coalesced into a single
+`send_message` call instead of one Bot API round trip per message. Media is
+never batched: callers flush the pending text first and then send the media
+on its own, so the order of messages in the target chat is preserved.
+
+Each queued text remembers the message it was relayed from. If a batch fails
+to send, every one of those source messages gets the failure reply, just as
+an immediate send failing inside the handler would.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from telegram import Bot, Message
+from telegram.constants import MessageLimit
+
+logger = logging.getLogger(__name__)
+
+BatchKey = tuple[int, int]
+
+
+class OutboundBatcher:
+    """Collects texts per (target chat, role) and sends them as one message.
+
+    The first text queued for a key starts a `max_wait_ms` timer; the batch is
+    sent when the timer fires or as soon as `max_batch` texts are queued,
+    whichever comes first. `max_batch=1` effectively disables batching.
+    """
+
+    def __init__(self, failure_reply: str, max_wait_ms: int = 250, max_batch: int = 10) -> None:
+        self.failure_reply = failure_reply
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        # Queued (text, source message) pairs per key.
+        self._pending: dict[BatchKey, list[tuple[str, Message]]] = {}
+        self._timers: dict[BatchKey, asyncio.Task] = {}
+        # Every timer task until it finishes, including ones already sending.
+        self._in_flight: set[asyncio.Task] = set()
+        # Per-key send locks and how many coroutines hold or wait on each.
+        self._locks: dict[BatchKey, asyncio.Lock] = {}
+        self._lock_users: dict[BatchKey, int] = {}
+
+    async def send_text(self, bot: Bot, chat_id: int, role: int, text: str, source: Message) -> None:
+        key = (chat_id, role)
+        batch = self._pending.get(key)
+        joined_length = sum(len(queued) for queued, _ in batch) + len(batch) if batch else 0
+        if batch and joined_length + len(text) > MessageLimit.MAX_TEXT_LENGTH:
+            # Joining would exceed Telegram's limit: send what we have first.
+            await self.flush(bot, chat_id, role)
+            batch = None
+        if batch is None:
+            batch = self._pending[key] = []
+        batch.append((text, source))
+        if len(batch) >= self.max_batch:
+            await self.flush(bot, chat_id, role)
+        elif len(batch) == 1:
+            timer = asyncio.create_task(self._flush_later(bot, key))
+            self._timers[key] = timer
+            self._in_flight.add(timer)
+            timer.add_done_callback(self._in_flight.discard)
+
+    async def flush(self, bot: Bot, chat_id: int, role: int) -> None:
+        """Send any text pending for the chat/role right away."""
+        key = (chat_id, role)
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        await self._send(bot, key)
+
+    async def flush_all(self, bot: Bot) -> None:
+        """Send everything still queued and wait for batches already being sent."""
+        for chat_id, role in list(self._pending):
+            await self.flush(bot, chat_id, role)
+        # Timers that popped their batch before flush() could cancel them are
+        # still inside send_message; let them finish before the bot shuts down.
+        await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    async def _flush_later(self, bot: Bot, key: BatchKey) -> None:
+        await asyncio.sleep(self.max_wait)
+        # Unregister before sending so a concurrent flush() cannot cancel us mid-send.
+        self._timers.pop(key, None)
+        await self._send(bot, key)
+
+    async def _send(self, bot: Bot, key: BatchKey) -> None:
+        # The per-key lock keeps an in-flight batch ahead of anything sent after it.
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._lock_users[key] = self._lock_users.get(key, 0) + 1
+        try:
+            async with lock:
+                batch = self._pending.pop(key, None)
+                if batch:
+                    await self._deliver(bot, key[0], batch)
+        finally:
+            self._lock_users[key] -= 1
+            if not self._lock_users[key]:
+                # Nobody holds or waits on the lock any more; a later send for
+                # this key creates a fresh one.
+                del self._lock_users[key]
+                del self._locks[key]
+
+    async def _deliver(self, bot: Bot, chat_id: int, batch: list[tuple[str, Message]]) -> None:
+        try:
+            await bot.send_message(chat_id=chat_id, text="\n".join(text for text, _ in batch))
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Не удалось отправить накопленные сообщения в чат %s: %s", chat_id, exc)
+            await self._report_failure(batch)
+
+    async def _report_failure(self, batch: list[tuple[str, Message]]) -> None:
+        for _, source in batch:
+            try:
+                await source.reply_text(self.failure_reply)
+            except Exception:  # noqa: BLE001
+                logger.exception("Не удалось отправить сообщение об ошибке")
@@ -8,10 +8,35 @@ Designed around SQLite but easily replaceable. The SQLite schema:
 """
 from __future__ import annotations
 
+import asyncio
 import sqlite3
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Any, AsyncIterator, Iterable, Optional, Tuple
+
+import aiosqlite
+
+
+# Statements are module-level constants so every call hands sqlite3's statement
+# cache the same string object. Columns are listed explicitly in a fixed order.
+_PROJECT_COLUMNS = "slug, customer_chat_id, executor_chat_id, is_active"
+_SELECT_ALL_BY_ROWID = f"SELECT {_PROJECT_COLUMNS} FROM projects ORDER BY rowid"
+_INSERT_PROJECT = "INSERT INTO projects (slug, executor_chat_id, is_active) VALUES (?, ?, 1)"
+_BIND_CUSTOMER = f"""
+    UPDATE projects SET customer_chat_id = ?, is_active = 1 WHERE slug = ?
+    RETURNING {_PROJECT_COLUMNS}
+"""
+# Clear whichever side matches the chat; if the chat is unrelated, deactivate
+# the project instead.
+_UNLINK_CHAT = f"""
+    UPDATE projects SET
+        executor_chat_id = CASE WHEN executor_chat_id = :chat_id THEN NULL ELSE executor_chat_id END,
+        customer_chat_id = CASE WHEN customer_chat_id = :chat_id THEN NULL ELSE customer_chat_id END,
+        is_active = CASE WHEN :chat_id IN (executor_chat_id, customer_chat_id) THEN 1 ELSE 0 END
+    WHERE slug = :slug
+    RETURNING {_PROJECT_COLUMNS}
+"""
 
 
 @dataclass
@@ -25,119 +50,155 @@ class Project:
 class ProjectStorage:
     """Abstract interface for project storage."""
 
-    def create_project(self, slug: str, executor_chat_id: int) -> Project:
+    async def create_project(self, slug: str, executor_chat_id: int) -> Project:
         raise NotImplementedError
 
-    def bind_customer(self, slug: str, customer_chat_id: int) -> Project:
+    async def bind_customer(self, slug: str, customer_chat_id: int) -> Project:
         raise NotImplementedError
 
-    def unlink_chat(self, slug: str, chat_id: int) -> Project:
+    async def unlink_chat(self, slug: str, chat_id: int) -> Project:
         raise NotImplementedError
 
-    def find_by_chat(self, chat_id: int) -> Optional[Project]:
+    async def find_by_chat(self, chat_id: int) -> Optional[Project]:
         raise NotImplementedError
 
-    def get(self, slug: str) -> Optional[Project]:
+    async def get(self, slug: str) -> Optional[Project]:
         raise NotImplementedError
 
-    def list_projects(self) -> Iterable[Project]:
+    async def list_projects(self) -> Iterable[Project]:
         raise NotImplementedError
 
 
 class SQLiteProjectStorage(ProjectStorage):
+    """SQLite storage on a single aiosqlite connection.
+
+    Call `connect()` from the running event loop before using the storage.
+    """
+
     def __init__(self, db_path: str) -> None:
         self.db_path = Path(db_path)
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self._init_db()
-
-    def _connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
-
-    def _init_db(self) -> None:
-        with self._connect() as conn:
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS projects (
-                    slug TEXT PRIMARY KEY,
-                    customer_chat_id INTEGER,
-                    executor_chat_id INTEGER,
-                    is_active INTEGER NOT NULL DEFAULT 1
-                )
-                """
+        parent = self.db_path.parent
+        # The default './projects.db' lives in the working directory, which always exists.
+        if parent != Path(".") and not parent.exists():
+            parent.mkdir(parents=True, exist_ok=True)
+        self._conn: Optional[aiosqlite.Connection] = None
+        # Writes are serialized so a transaction never interleaves with another.
+        self._lock = asyncio.Lock()
+        # Projects only change through admin commands, so lookups on the relay
+        # hot path are served from memory. Writes update these maps after commit.
+        self._by_slug: dict[str, Project] = {}
+        self._by_chat: dict[int, Project] = {}
+
+    async def connect(self) -> None:
+        # One long-lived connection keeps SQLite's page cache and parsed schema
+        # warm between calls; aiosqlite runs it off the event loop thread.
+        self._conn = await aiosqlite.connect(self.db_path, isolation_level=None)
+        await self._conn.execute("PRAGMA journal_mode=WAL")
+        await self._conn.execute("PRAGMA synchronous=NORMAL")
+        await self._conn.execute("PRAGMA temp_store=MEMORY")
+        await self._conn.execute("PRAGMA cache_size=-8000")
+        await self._conn.execute("PRAGMA wal_autocheckpoint=1000")
+        await self._init_db()
+        await self._load_cache()
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            try:
+                # Fold the WAL back into the database file so it does not keep
+                # growing across a long-running deployment.
+                await self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            finally:
+                # aiosqlite's worker thread is not a daemon: it must be closed
+                # even if the checkpoint fails, or the process never exits.
+                await self._conn.close()
+                self._conn = None
+
+    async def _init_db(self) -> None:
+        await self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS projects (
+                slug TEXT PRIMARY KEY,
+                customer_chat_id INTEGER,
+                executor_chat_id INTEGER,
+                is_active INTEGER NOT NULL DEFAULT 1
             )
-            conn.commit()
-
-    def _row_to_project(self, row: sqlite3.Row) -> Project:
-        return Project(
-            slug=row["slug"],
-            customer_chat_id=row["customer_chat_id"],
-            executor_chat_id=row["executor_chat_id"],
-            is_active=bool(row["is_active"]),
+            """
         )
 
-    def create_project(self, slug: str, executor_chat_id: int) -> Project:
-        with self._connect() as conn:
-            existing = conn.execute("SELECT slug FROM projects WHERE slug = ?", (slug,)).fetchone()
-            if existing:
-                raise ValueError(f"Проект {slug} уже существует")
-            conn.execute(
-                "INSERT INTO projects (slug, executor_chat_id, is_active) VALUES (?, ?, 1)",
-                (slug, executor_chat_id),
-            )
-            conn.commit()
-        return Project(slug=slug, customer_chat_id=None, executor_chat_id=executor_chat_id, is_active=True)
-
-    def bind_customer(self, slug: str, customer_chat_id: int) -> Project:
-        with self._connect() as conn:
-            row = conn.execute("SELECT * FROM projects WHERE slug = ?", (slug,)).fetchone()
-            if not row:
-                raise ValueError(f"Проект {slug} не найден")
-            conn.execute(
-                "UPDATE projects SET customer_chat_id = ?, is_active = 1 WHERE slug = ?",
-                (customer_chat_id, slug),
-            )
-            conn.commit()
-        return self.get(slug)  # type: ignore[return-value]
-
-    def unlink_chat(self, slug: str, chat_id: int) -> Project:
-        with self._connect() as conn:
-            row = conn.execute("SELECT * FROM projects WHERE slug = ?", (slug,)).fetchone()
-            if not row:
-                raise ValueError(f"Проект {slug} не найден")
+    @asynccontextmanager
+    async def _transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        # Callers hold self._lock.
+        await self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            await self._conn.execute("ROLLBACK")
+            raise
+        await self._conn.execute("COMMIT")
+
+    async def _load_cache(self) -> None:
+        async with self._conn.execute(_SELECT_ALL_BY_ROWID) as cur:
+            rows = await cur.fetchall()
+        self._by_slug = {row[0]: self._row_to_project(row) for row in rows}
+        self._rebuild_chat_index()
+
+    def _rebuild_chat_index(self) -> None:
+        by_chat: dict[int, Project] = {}
+        # Insertion order follows rowid, so the first matching project wins just
+        # like the unordered SELECT used to.
+        for project in self._by_slug.values():
+            if project.executor_chat_id is not None:
+                by_chat.setdefault(project.executor_chat_id, project)
+            if project.customer_chat_id is not None:
+                by_chat.setdefault(project.customer_chat_id, project)
+        self._by_chat = by_chat
+
+    def _cache_project(self, project: Project) -> None:
+        self._by_slug[project.slug] = project
+        self._rebuild_chat_index()
+
+    def _row_to_project(self, row: Tuple[Any, ...]) -> Project:
+        # Rows are plain tuples in _PROJECT_COLUMNS order.
+        return Project(row[0], row[1], row[2], bool(row[3]))
+
+    async def create_project(self, slug: str, executor_chat_id: int) -> Project:
+        async with self._lock:
+            async with self._transaction() as conn:
+                try:
+                    await conn.execute(_INSERT_PROJECT, (slug, executor_chat_id))
+                except sqlite3.IntegrityError as exc:
+                    raise ValueError(f"Проект {slug} уже существует") from exc
+            project = Project(slug=slug, customer_chat_id=None, executor_chat_id=executor_chat_id, is_active=True)
+            self._cache_project(project)
+        return project
+
+    async def bind_customer(self, slug: str, customer_chat_id: int) -> Project:
+        async with self._lock:
+            async with self._transaction() as conn:
+                async with conn.execute(_BIND_CUSTOMER, (customer_chat_id, slug)) as cur:
+                    row = await cur.fetchone()
+                if not row:
+                    raise ValueError(f"Проект {slug} не найден")
+            project = self._row_to_project(row)
+            self._cache_project(project)
+        return project
+
+    async def unlink_chat(self, slug: str, chat_id: int) -> Project:
+        async with self._lock:
+            async with self._transaction() as conn:
+                async with conn.execute(_UNLINK_CHAT, {"chat_id": chat_id, "slug": slug}) as cur:
+                    row = await cur.fetchone()
+                if not row:
+                    raise ValueError(f"Проект {slug} не найден")
             project = self._row_to_project(row)
-            updates = []
-            if project.executor_chat_id == chat_id:
-                updates.append(("executor_chat_id", None))
-            if project.customer_chat_id == chat_id:
-                updates.append(("customer_chat_id", None))
-            if not updates:
-                # If the chat is unrelated, deactivate the project instead.
-                conn.execute("UPDATE projects SET is_active = 0 WHERE slug = ?", (slug,))
-            else:
-                for column, value in updates:
-                    conn.execute(f"UPDATE projects SET {column} = ?, is_active = 1 WHERE slug = ?", (value, slug))
-            conn.commit()
-        return self.get(slug)  # type: ignore[return-value]
-
-    def find_by_chat(self, chat_id: int) -> Optional[Project]:
-        with self._connect() as conn:
-            row = conn.execute(
-                """
-                SELECT * FROM projects
-                WHERE executor_chat_id = ? OR customer_chat_id = ?
-                """,
-                (chat_id, chat_id),
-            ).fetchone()
-        return self._row_to_project(row) if row else None
-
-    def get(self, slug: str) -> Optional[Project]:
-        with self._connect() as conn:
-            row = conn.execute("SELECT * FROM projects WHERE slug = ?", (slug,)).fetchone()
-        return self._row_to_project(row) if row else None
-
-    def list_projects(self) -> Iterable[Project]:
-        with self._connect() as conn:
-            rows = conn.execute("SELECT * FROM projects ORDER BY slug").fetchall()
-        return [self._row_to_project(row) for row in rows]
+            self._cache_project(project)
+        return project
+
+    async def find_by_chat(self, chat_id: int) -> Optional[Project]:
+        return self._by_chat.get(chat_id)
+
+    async def get(self, slug: str) -> Optional[Project]:
+        return self._by_slug.get(slug)
+
+    async def list_projects(self) -> Iterable[Project]:
+        return sorted(self._by_slug.values(), key=lambda project: project.slug)